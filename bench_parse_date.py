@@ -0,0 +1,60 @@
+"""Сравнение скорости parse_date с прежней реализацией на strptime.
+
+Запуск: python bench_parse_date.py
+"""
+import timeit
+from datetime import datetime
+
+from utils import parse_date, parse_dates
+
+# (случай, строка, поддерживается ли прежней реализацией)
+SAMPLES = [
+    ("полная дата", "01.01.1990", True),
+    ("без года", "15-03", True),
+    ("неверная строка", "не дата", True),
+    ("ISO", "1990-01-01", False),
+    ("название месяца", "5 марта 1990", False),
+]
+
+
+def legacy_parse_date(date_str: str) -> datetime:
+    """Прежняя реализация: перебор форматов strptime"""
+    date_str = date_str.strip()
+    formats = ["%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y", "%d.%m", "%d/%m", "%d-%m"]
+    for fmt in formats:
+        try:
+            parsed_date = datetime.strptime(date_str, fmt)
+            if fmt in ["%d.%m", "%d/%m", "%d-%m"]:
+                parsed_date = parsed_date.replace(year=datetime.now().year)
+            return parsed_date
+        except ValueError:
+            continue
+    raise ValueError("Неверный формат даты")
+
+
+def measure(func, value: str, number: int) -> float:
+    def call():
+        try:
+            func(value)
+        except ValueError:
+            pass
+    return timeit.timeit(call, number=number) / number * 1e6
+
+
+def main(number: int = 20000):
+    print(f"{'случай':<18}{'strptime, мкс':>15}{'regex, мкс':>13}{'ускорение':>12}")
+    for title, value, legacy_supported in SAMPLES:
+        new = measure(parse_date, value, number)
+        if legacy_supported:
+            legacy = measure(legacy_parse_date, value, number)
+            print(f"{title:<18}{legacy:>15.2f}{new:>13.2f}{legacy / new:>11.1f}x")
+        else:
+            print(f"{title:<18}{'—':>15}{new:>13.2f}{'—':>12}")
+
+    rows = [value for _, value, _ in SAMPLES] * 200
+    batch = timeit.timeit(lambda: parse_dates(rows), number=20) / 20 / len(rows) * 1e6
+    print(f"\nПакетный разбор ({len(rows)} строк): {batch:.2f} мкс на строку")
+
+
+if __name__ == '__main__':
+    main()
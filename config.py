@@ -5,4 +5,40 @@ load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 MONGODB_URL = os.getenv("MONGODB_URL")
-DATABASE_NAME = os.getenv("DATABASE_NAME", "birthday_bot")
\ No newline at end of file
+DATABASE_NAME = os.getenv("DATABASE_NAME", "birthday_bot")
+
+# Настройки подключения к MongoDB
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "20000"))
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0"))  # 0 — без ограничения
+# Сжатие трафика, например "zstd,snappy,zlib" (zstd требует пакет zstandard, snappy — python-snappy)
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+
+# Создание индексов при старте: sync — дождаться, background — в фоне, skip — не проверять
+MONGO_INDEX_MODE = os.getenv("MONGO_INDEX_MODE", "sync")
+
+# Чтение для просмотра (списки, карточки, напоминания) можно отправлять на secondary
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+MONGO_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "-1"))  # -1 — без ограничения
+
+# Проверки работоспособности для /ready и /live
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "10"))
+# Сколько может пройти без успешной проверки напоминаний (они запускаются раз в сутки)
+REMINDERS_STALE_SECONDS = int(os.getenv("REMINDERS_STALE_SECONDS", str(26 * 60 * 60)))
+
+# Индекс напоминаний в памяти (синхронизируется через change streams, нужен replica set)
+REMINDER_INDEX_ENABLED = os.getenv("REMINDER_INDEX_ENABLED", "false").lower() == "true"
+REMINDER_INDEX_RESYNC_INTERVAL = int(os.getenv("REMINDER_INDEX_RESYNC_INTERVAL", "300"))
+
+# Повторные попытки отправки напоминаний при временных ошибках
+SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", "3"))
+SEND_RETRY_BASE_DELAY = float(os.getenv("SEND_RETRY_BASE_DELAY", "1"))
+
+# Трассировка апдейтов: доля трассируемых апдейтов (0 — выключено) и файл для спанов
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+# Архивирование неактивных пользователей (0 — не архивировать по этому признаку)
+ARCHIVE_UNDELIVERABLE_AFTER_DAYS = int(os.getenv("ARCHIVE_UNDELIVERABLE_AFTER_DAYS", "30"))
+ARCHIVE_INACTIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_INACTIVE_AFTER_DAYS", "0"))
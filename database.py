@@ -1,80 +1,442 @@
 import os
+import asyncio
+import logging
+import secrets
 import certifi
 from motor.motor_asyncio import AsyncIOMotorClient
-from config import MONGODB_URL, DATABASE_NAME
-from datetime import datetime
+from config import (
+    MONGODB_URL, DATABASE_NAME, MONGO_TIMEOUT_MS, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE,
+    MONGO_MAX_IDLE_TIME_MS, MONGO_COMPRESSORS, MONGO_READ_PREFERENCE, MONGO_MAX_STALENESS_SECONDS,
+    MONGO_INDEX_MODE
+)
+from datetime import datetime, date, timedelta
 from typing import List, Optional
 import pymongo
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
 from bson import ObjectId
+from tracing import traced
+from utils import normalize_name
+
+logger = logging.getLogger(__name__)
+
+# Сколько хранить материализованные напоминания после даты отправки
+DUE_REMINDERS_TTL = 7 * 24 * 60 * 60
+# Размер пачки при удалении и выгрузке данных пользователя
+USER_DATA_BATCH_SIZE = 500
+# Верхняя граница для поиска по префиксу строки
+PREFIX_UPPER_BOUND = "\U0010ffff"
+# Сколько хранить неудачные отправки для разбора
+FAILED_DELIVERIES_TTL = 30 * 24 * 60 * 60
+
+READ_PREFERENCES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def build_read_preference():
+    """Режим чтения для запросов, которые только отображают данные"""
+    if MONGO_READ_PREFERENCE == "primary":
+        return Primary()
+    if MONGO_READ_PREFERENCE not in READ_PREFERENCES:
+        raise RuntimeError(f"Неизвестный MONGO_READ_PREFERENCE: {MONGO_READ_PREFERENCE}")
+    return READ_PREFERENCES[MONGO_READ_PREFERENCE](max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+
+def month_day_key(d) -> int:
+    """Ключ «месяц-день» для поиска по дате без учёта года: 15 марта -> 315"""
+    return d.month * 100 + d.day
 
 
 class Database:
     def __init__(self):
         self.client = None
         self.db = None
+        self.read_db = None
+        self.index_task = None
+        self.migration_task = None
 
-    async def init(self):
+    async def init(self, index_mode: str = MONGO_INDEX_MODE):
         """Инициализация подключения к MongoDB"""
         if not MONGODB_URL:
             raise RuntimeError("Не задана переменная окружения MONGODB_URL")
 
+        client_options = {
+            "maxPoolSize": MONGO_MAX_POOL_SIZE,
+            "minPoolSize": MONGO_MIN_POOL_SIZE,
+        }
+        if MONGO_MAX_IDLE_TIME_MS > 0:
+            client_options["maxIdleTimeMS"] = MONGO_MAX_IDLE_TIME_MS
+        if MONGO_COMPRESSORS:
+            client_options["compressors"] = MONGO_COMPRESSORS
+
         # Создаём клиент с TLS и корневыми сертификатами certifi
         self.client = AsyncIOMotorClient(
             MONGODB_URL,
             tls=True,
             tlsAllowInvalidCertificates=False,
             tlsCAFile=certifi.where(),
-            socketTimeoutMS=20000,
-            connectTimeoutMS=20000,
-            serverSelectionTimeoutMS=20000,
+            socketTimeoutMS=MONGO_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+            **client_options,
         )
 
         # Принудительный вызов ping, чтобы проверить связь и сразу поймать ошибки
         try:
-            await self.client.admin.command("ping")
+            await self.ping()
         except Exception as e:
             raise RuntimeError(f"Не удалось подключиться к MongoDB: {e}")
 
         # Инициализируем базу и создаём индексы
         self.db = self.client[DATABASE_NAME]
-        await self.create_indexes()
+        # Записи всегда идут на primary, а просмотр может читать с secondary
+        self.read_db = self.client.get_database(DATABASE_NAME, read_preference=build_read_preference())
+        if index_mode == "sync":
+            await self.create_indexes()
+        elif index_mode == "background":
+            # Индексы обычно уже существуют, поэтому проверку можно не ждать
+            self.index_task = asyncio.create_task(self.create_indexes_in_background())
+        elif index_mode != "skip":
+            raise RuntimeError(f"Неизвестный MONGO_INDEX_MODE: {index_mode}")
+        if index_mode != "skip":
+            # Разовые миграции данных выполняются в фоне и только один раз
+            self.migration_task = asyncio.create_task(self.run_migrations())
         print(f"✅ Успешно подключились к базе {DATABASE_NAME}")
 
+    @traced("db.ping")
+    async def ping(self):
+        """Проверка связи с MongoDB"""
+        await self.client.admin.command("ping")
+
     async def create_indexes(self):
         """Создание индексов для оптимизации запросов"""
-        await self.db.users.create_index("telegram_id", unique=True)
-        await self.db.birthdays.create_index("user_id")
-        await self.db.reminders.create_index("birthday_id")
+        # Индексы независимы друг от друга, поэтому создаём их параллельно
+        await asyncio.gather(
+            self.db.users.create_index("telegram_id", unique=True),
+            self.db.users.create_index("share_code", unique=True, sparse=True),
+            self.db.subscriptions.create_index([("owner_id", 1), ("chat_id", 1)], unique=True),
+            self.db.birthdays.create_index("user_id"),
+            self.db.birthdays.create_index([("user_id", 1), ("birth_md", 1)]),
+            self.db.birthdays.create_index([("user_id", 1), ("name_norm", 1)]),
+            self.db.reminders.create_index("birthday_id"),
+            # Частичный индекс содержит только активные напоминания и не растёт из-за отключённых
+            self.db.reminders.create_index([("birthday_id", 1), ("days_before", 1)], name="active_by_birthday",
+                                           partialFilterExpression={"is_active": True}),
+            self.db.users.create_index("undeliverable_at", sparse=True),
+            self.db.users.create_index("last_seen_at", sparse=True),
+            self.db.birthdays_archive.create_index("user_id"),
+            self.db.reminders_archive.create_index("birthday_id"),
+            # Материализованные напоминания читаются по дате отправки в порядке user_id,
+            # а старые дни удаляются автоматически по TTL
+            self.db.due_reminders.create_index([("send_date", 1), ("user_id", 1)]),
+            self.db.due_reminders.create_index("send_date", name="send_date_ttl",
+                                               expireAfterSeconds=DUE_REMINDERS_TTL),
+            self.db.failed_deliveries.create_index("created_at", expireAfterSeconds=FAILED_DELIVERIES_TTL),
+        )
 
+    def migrations(self):
+        """Разовые миграции данных: (имя, корутина-функция)"""
+        return [
+            ("birth_md", self.backfill_month_day_keys),
+            ("name_norm", self.backfill_normalized_names),
+            ("last_seen_at", self.backfill_last_seen),
+        ]
+
+    async def run_migrations(self):
+        """Выполняет миграции, которые ещё не отмечены в коллекции migrations"""
+        for name, migrate in self.migrations():
+            try:
+                if await self.db.migrations.find_one({"_id": name}):
+                    continue
+                await migrate()
+                await self.db.migrations.update_one(
+                    {"_id": name},
+                    {"$set": {"applied_at": datetime.utcnow()}},
+                    upsert=True
+                )
+                logger.info(f"Миграция {name} выполнена")
+            except Exception as e:
+                logger.error(f"Ошибка при выполнении миграции {name}: {e}")
+
+    async def backfill_month_day_keys(self):
+        """Проставляет birth_md записям, созданным до появления этого поля"""
+        await self.db.birthdays.update_many(
+            {"birth_md": {"$exists": False}},
+            [{"$set": {"birth_md": {"$add": [
+                {"$multiply": [{"$month": "$birth_date"}, 100]},
+                {"$dayOfMonth": "$birth_date"}
+            ]}}}]
+        )
+
+    async def backfill_last_seen(self):
+        """Проставляет last_seen_at = created_at пользователям, созданным до появления этого поля"""
+        await self.db.users.update_many(
+            {"last_seen_at": {"$exists": False}},
+            [{"$set": {"last_seen_at": {"$ifNull": ["$created_at", "$$NOW"]}}}]
+        )
+
+    async def backfill_normalized_names(self):
+        """Проставляет name_norm записям, созданным до появления этого поля"""
+        # $toLower в MongoDB не понимает кириллицу, поэтому нормализуем имена на стороне Python
+        cursor = self.db.birthdays.find({"name_norm": {"$exists": False}}, {"name": 1}).batch_size(USER_DATA_BATCH_SIZE)
+        batch = []
+        async for b in cursor:
+            batch.append(pymongo.UpdateOne({"_id": b["_id"]}, {"$set": {"name_norm": normalize_name(b["name"])}}))
+            if len(batch) >= USER_DATA_BATCH_SIZE:
+                await self.db.birthdays.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            await self.db.birthdays.bulk_write(batch, ordered=False)
+
+    async def create_indexes_in_background(self):
+        """Создание индексов без блокировки запуска"""
+        try:
+            await self.create_indexes()
+        except Exception as e:
+            logger.error(f"Ошибка при создании индексов: {e}")
+
+    @traced("db.add_user")
     async def add_user(self, telegram_id: int, username: str = None):
         """Добавить пользователя"""
         user_data = {
             "telegram_id": telegram_id,
             "username": username,
-            "created_at": datetime.utcnow()
+            "created_at": datetime.utcnow(),
+            "last_seen_at": datetime.utcnow()
         }
         try:
             await self.db.users.insert_one(user_data)
         except pymongo.errors.DuplicateKeyError:
             await self.db.users.update_one(
                 {"telegram_id": telegram_id},
-                {"$set": {"username": username}}
+                {"$set": {"username": username, "last_seen_at": datetime.utcnow()}}
+            )
+
+    @traced("db.touch_user")
+    async def touch_user(self, telegram_id: int):
+        """Отмечает, что пользователь пользовался ботом"""
+        await self.db.users.update_one(
+            {"telegram_id": telegram_id},
+            {"$set": {"last_seen_at": datetime.utcnow()}}
+        )
+
+    @traced("db.archive_inactive_users")
+    async def archive_inactive_users(self, undeliverable_before: Optional[datetime],
+                                     inactive_before: Optional[datetime]) -> int:
+        """Переносит дни рождения и напоминания неактивных пользователей в архивные коллекции"""
+        conditions = []
+        if undeliverable_before:
+            conditions.append({"undeliverable_at": {"$lt": undeliverable_before}})
+        if inactive_before:
+            conditions.append({"last_seen_at": {"$lt": inactive_before}})
+        if not conditions:
+            return 0
+
+        cursor = self.db.users.find(
+            {"archived_at": {"$exists": False}, "$or": conditions},
+            {"telegram_id": 1}
+        ).batch_size(USER_DATA_BATCH_SIZE)
+        archived = 0
+        batch = []
+        async for user in cursor:
+            batch.append(user["telegram_id"])
+            if len(batch) >= USER_DATA_BATCH_SIZE:
+                archived += await self.archive_users_batch(batch)
+                batch = []
+        if batch:
+            archived += await self.archive_users_batch(batch)
+        return archived
+
+    async def archive_users_batch(self, user_ids: List[int]) -> int:
+        # Владельцев списков с подписчиками не архивируем — иначе подписчики перестанут получать напоминания
+        shared = set(await self.db.subscriptions.distinct("owner_id", {"owner_id": {"$in": user_ids}}))
+        user_ids = [user_id for user_id in user_ids if user_id not in shared]
+        if not user_ids:
+            return 0
+
+        cursor = self.db.birthdays.find({"user_id": {"$in": user_ids}}, {"_id": 1})
+        birthday_oids = [b["_id"] async for b in cursor]
+        await self.move_to_archive("birthdays", birthday_oids)
+
+        # Напоминания ищем уже после переноса дней рождения, чтобы захватить и добавленные за это время
+        birthday_ids = [str(birthday_id) for birthday_id in birthday_oids]
+        cursor = self.db.reminders.find({"birthday_id": {"$in": birthday_ids}}, {"_id": 1})
+        await self.move_to_archive("reminders", [r["_id"] async for r in cursor])
+        await self.db.due_reminders.delete_many({"birthday_id": {"$in": birthday_ids}})
+
+        result = await self.db.users.update_many(
+            {"telegram_id": {"$in": user_ids}},
+            {"$set": {"archived_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+
+    async def move_to_archive(self, collection: str, ids: list):
+        """Копирует документы в <collection>_archive и удаляет из рабочей коллекции только скопированные _id"""
+        if not ids:
+            return
+        # Сначала копируем, потом удаляем — при сбое данные остаются в рабочей коллекции
+        await self.db[collection].aggregate([
+            {"$match": {"_id": {"$in": ids}}},
+            {"$merge": {"into": f"{collection}_archive", "on": "_id", "whenMatched": "replace"}}
+        ]).to_list(length=None)
+        await self.db[collection].delete_many({"_id": {"$in": ids}})
+
+    @traced("db.restore_archived_user")
+    async def restore_archived_user(self, telegram_id: int) -> bool:
+        """Возвращает данные пользователя из архива, если он снова пришёл в бота"""
+        user = await self.db.users.find_one({"telegram_id": telegram_id, "archived_at": {"$exists": True}},
+                                            {"_id": 1})
+        if not user:
+            return False
+
+        cursor = self.db.birthdays_archive.find({"user_id": telegram_id}, {"_id": 1})
+        birthday_ids = [str(b["_id"]) async for b in cursor]
+
+        await self.db.birthdays_archive.aggregate([
+            {"$match": {"user_id": telegram_id}},
+            {"$merge": {"into": "birthdays", "on": "_id", "whenMatched": "keepExisting"}}
+        ]).to_list(length=None)
+        await self.db.reminders_archive.aggregate([
+            {"$match": {"birthday_id": {"$in": birthday_ids}}},
+            {"$merge": {"into": "reminders", "on": "_id", "whenMatched": "keepExisting"}}
+        ]).to_list(length=None)
+
+        await asyncio.gather(
+            self.db.reminders_archive.delete_many({"birthday_id": {"$in": birthday_ids}}),
+            self.db.birthdays_archive.delete_many({"user_id": telegram_id}),
+        )
+        await self.db.users.update_one({"telegram_id": telegram_id}, {"$unset": {"archived_at": ""}})
+        return True
+
+    @traced("db.restore_deliverable")
+    async def restore_deliverable(self, telegram_id: int):
+        """Включает напоминания пользователя, которые были отключены из-за недоступности чата"""
+        user = await self.db.users.find_one_and_update(
+            {"telegram_id": telegram_id, "$or": [
+                {"undeliverable_at": {"$exists": True}},
+                {"unreachable_at": {"$exists": True}}
+            ]},
+            {"$unset": {"undeliverable_at": "", "unreachable_at": ""}}
+        )
+        if not user or "undeliverable_at" not in user:
+            return
+        birthday_ids = await self.get_birthday_ids([telegram_id])
+        await self.db.reminders.update_many(
+            {"birthday_id": {"$in": birthday_ids}, "deactivated_reason": "undeliverable"},
+            {"$set": {"is_active": True}, "$unset": {"deactivated_reason": ""}}
+        )
+
+    @traced("db.get_share_code")
+    async def get_share_code(self, owner_id: int) -> str:
+        """Возвращает код приглашения к списку дней рождения пользователя, создавая его при необходимости"""
+        await self.db.users.update_one(
+            {"telegram_id": owner_id, "share_code": {"$exists": False}},
+            {"$set": {"share_code": secrets.token_urlsafe(8)}}
+        )
+        user = await self.db.users.find_one({"telegram_id": owner_id}, {"share_code": 1})
+        return user["share_code"]
+
+    @traced("db.subscribe")
+    async def subscribe(self, share_code: str, chat_id: int) -> Optional[dict]:
+        """Подписывает чат (пользователя или группу) на общий список. Возвращает владельца списка"""
+        owner = await self.db.users.find_one({"share_code": share_code}, {"telegram_id": 1, "username": 1})
+        if not owner:
+            return None
+        if owner["telegram_id"] != chat_id:
+            # Участники хранятся отдельными документами, чтобы большие списки не раздували документы
+            await self.db.subscriptions.update_one(
+                {"owner_id": owner["telegram_id"], "chat_id": chat_id},
+                {"$setOnInsert": {"created_at": datetime.utcnow()}},
+                upsert=True
             )
+        return owner
+
+    @traced("db.unsubscribe")
+    async def unsubscribe(self, share_code: str, chat_id: int) -> bool:
+        owner = await self.db.users.find_one({"share_code": share_code}, {"telegram_id": 1})
+        if not owner:
+            return False
+        result = await self.db.subscriptions.delete_one({"owner_id": owner["telegram_id"], "chat_id": chat_id})
+        return result.deleted_count > 0
 
+    @traced("db.get_subscribers")
+    async def get_subscribers(self, owner_ids) -> dict:
+        """Подписчики общих списков одним запросом: {owner_id: [chat_id, ...]}"""
+        cursor = self.db.subscriptions.find(
+            {"owner_id": {"$in": list(owner_ids)}},
+            {"_id": 0, "owner_id": 1, "chat_id": 1}
+        )
+        subscribers = {}
+        async for s in cursor:
+            subscribers.setdefault(s["owner_id"], []).append(s["chat_id"])
+        return subscribers
+
+    @traced("db.add_birthday")
     async def add_birthday(self, user_id: int, name: str, birth_date: datetime, gift_ideas: str = None):
         birth_datetime = datetime.combine(birth_date.date(), datetime.min.time()) if hasattr(birth_date, 'date') else birth_date
         birthday_data = {
             "user_id": user_id,
             "name": name,
+            "name_norm": normalize_name(name),
             "birth_date": birth_datetime,
+            "birth_md": month_day_key(birth_datetime),
             "gift_ideas": gift_ideas,
             "created_at": datetime.utcnow()
         }
         result = await self.db.birthdays.insert_one(birthday_data)
         return str(result.inserted_id)
 
+    @traced("db.get_birthdays")
     async def get_birthdays(self, user_id: int):
-        cursor = self.db.birthdays.find({"user_id": user_id}).sort("birth_date", 1)
+        cursor = self.read_db.birthdays.find({"user_id": user_id}).sort("birth_date", 1)
+        birthdays = []
+        async for b in cursor:
+            b["id"] = str(b["_id"])
+            del b["_id"]
+            if isinstance(b["birth_date"], datetime):
+                b["birth_date"] = b["birth_date"].date()
+            birthdays.append(b)
+        return birthdays
+
+    @traced("db.get_upcoming_birthdays")
+    async def get_upcoming_birthdays(self, user_id: int, days: int):
+        """Дни рождения в ближайшие days дней, отсортированные по близости"""
+        today = date.today()
+        start_key = month_day_key(today)
+        end_key = month_day_key(today + timedelta(days=days))
+
+        # Если интервал переходит через Новый год, нужен второй проход с начала года
+        if days < 365 and (today + timedelta(days=days)).year == today.year:
+            ranges = [{"$gte": start_key, "$lte": end_key}]
+        else:
+            tail = {"$gte": 101, "$lte": end_key} if end_key < start_key else {"$gte": 101, "$lt": start_key}
+            ranges = [{"$gte": start_key, "$lte": 1231}, tail]
+
+        birthdays = []
+        for key_range in ranges:
+            cursor = self.read_db.birthdays.find(
+                {"user_id": user_id, "birth_md": key_range},
+                {"name": 1, "birth_date": 1}
+            ).sort("birth_md", 1)
+            async for b in cursor:
+                b["id"] = str(b["_id"])
+                del b["_id"]
+                if isinstance(b["birth_date"], datetime):
+                    b["birth_date"] = b["birth_date"].date()
+                birthdays.append(b)
+        return birthdays
+
+    @traced("db.search_birthdays")
+    async def search_birthdays(self, user_id: int, query: str, offset: int = 0, limit: int = 20):
+        """Поиск дней рождения по началу имени одним проходом по индексу (user_id, name_norm)"""
+        prefix = normalize_name(query)
+        cursor = self.read_db.birthdays.find(
+            {"user_id": user_id, "name_norm": {"$gte": prefix, "$lt": prefix + PREFIX_UPPER_BOUND}},
+            {"name": 1, "birth_date": 1, "gift_ideas": 1}
+        ).sort("name_norm", 1).skip(offset).limit(limit)
         birthdays = []
         async for b in cursor:
             b["id"] = str(b["_id"])
@@ -84,19 +446,103 @@ class Database:
             birthdays.append(b)
         return birthdays
 
+    @traced("db.update_gift_ideas")
     async def update_gift_ideas(self, birthday_id: str, gift_ideas: str):
         await self.db.birthdays.update_one(
             {"_id": ObjectId(birthday_id)},
             {"$set": {"gift_ideas": gift_ideas}}
         )
+        # Уже подготовленные напоминания должны уйти с новыми идеями
+        await self.db.due_reminders.update_many(
+            {"birthday_id": birthday_id},
+            {"$set": {"gift_ideas": gift_ideas}}
+        )
 
+    @traced("db.delete_birthday")
     async def delete_birthday(self, birthday_id: str, user_id: int):
-        await self.db.reminders.delete_many({"birthday_id": birthday_id})
-        await self.db.birthdays.delete_one({
+        # Сначала удаляем сам день рождения с проверкой владельца, чтобы нельзя было удалить чужие напоминания
+        result = await self.db.birthdays.delete_one({
             "_id": ObjectId(birthday_id),
             "user_id": user_id
         })
+        if result.deleted_count:
+            await self.delete_birthday_dependents([birthday_id])
+
+    async def delete_birthday_dependents(self, birthday_ids: List[str]):
+        """Удаляет напоминания, относящиеся к дням рождения"""
+        await asyncio.gather(
+            self.db.reminders.delete_many({"birthday_id": {"$in": birthday_ids}}),
+            self.db.due_reminders.delete_many({"birthday_id": {"$in": birthday_ids}}),
+        )
+
+    @traced("db.get_user")
+    async def get_user(self, telegram_id: int) -> Optional[dict]:
+        return await self.db.users.find_one({"telegram_id": telegram_id}, {"_id": 0})
+
+    async def iter_export_birthdays(self, user_id: int):
+        """Дни рождения пользователя вместе с напоминаниями, по одному документу (включая архивные)"""
+        # Выгрузка только читает архив и не возвращает данные в рабочие коллекции
+        sources = [("birthdays", "reminders"), ("birthdays_archive", "reminders_archive")]
+        for birthdays_collection, reminders_collection in sources:
+            pipeline = [
+                {"$match": {"user_id": user_id}},
+                {"$lookup": {
+                    "from": reminders_collection,
+                    "let": {"birthday_id": {"$toString": "$_id"}},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$eq": ["$birthday_id", "$$birthday_id"]}}},
+                        {"$project": {"_id": 0, "days_before": 1, "is_active": 1, "created_at": 1}}
+                    ],
+                    "as": "reminders"
+                }},
+                {"$project": {"_id": 0, "user_id": 0, "birth_md": 0, "name_norm": 0}}
+            ]
+            cursor = self.db[birthdays_collection].aggregate(pipeline, batchSize=USER_DATA_BATCH_SIZE)
+            async for b in cursor:
+                yield b
+
+    async def iter_export_subscriptions(self, chat_id: int):
+        """Списки, на которые подписан чат"""
+        cursor = self.db.subscriptions.find(
+            {"chat_id": chat_id},
+            {"_id": 0, "chat_id": 0}
+        ).batch_size(USER_DATA_BATCH_SIZE)
+        async for s in cursor:
+            yield s
+
+    @traced("db.delete_user_data")
+    async def delete_user_data(self, user_id: int) -> int:
+        """Удаляет пользователя вместе с днями рождения и напоминаниями. Возвращает число удалённых дней рождения"""
+        deleted = 0
+        cursor = self.db.birthdays.find({"user_id": user_id}, {"_id": 1}).batch_size(USER_DATA_BATCH_SIZE)
+        batch = []
+        async for b in cursor:
+            batch.append(b["_id"])
+            if len(batch) >= USER_DATA_BATCH_SIZE:
+                deleted += await self.delete_birthdays_batch(batch)
+                batch = []
+        if batch:
+            deleted += await self.delete_birthdays_batch(batch)
 
+        # Архивные данные тоже принадлежат пользователю
+        cursor = self.db.birthdays_archive.find({"user_id": user_id}, {"_id": 1})
+        archived_ids = [str(b["_id"]) async for b in cursor]
+
+        await asyncio.gather(
+            self.db.reminders_archive.delete_many({"birthday_id": {"$in": archived_ids}}),
+            self.db.birthdays_archive.delete_many({"user_id": user_id}),
+            self.db.subscriptions.delete_many({"$or": [{"owner_id": user_id}, {"chat_id": user_id}]}),
+            self.db.failed_deliveries.delete_many({"chat_id": user_id}),
+            self.db.users.delete_one({"telegram_id": user_id}),
+        )
+        return deleted
+
+    async def delete_birthdays_batch(self, birthday_ids: List[ObjectId]) -> int:
+        await self.delete_birthday_dependents([str(birthday_id) for birthday_id in birthday_ids])
+        result = await self.db.birthdays.delete_many({"_id": {"$in": birthday_ids}})
+        return result.deleted_count
+
+    @traced("db.add_reminder")
     async def add_reminder(self, birthday_id: str, days_before: int):
         reminder_data = {
             "birthday_id": birthday_id,
@@ -104,10 +550,13 @@ class Database:
             "is_active": True,
             "created_at": datetime.utcnow()
         }
-        await self.db.reminders.insert_one(reminder_data)
+        result = await self.db.reminders.insert_one(reminder_data)
+        # Ночная подготовка уже могла пройти — досчитываем новое напоминание на сегодня
+        await self.materialize_due_reminders(date.today(), {"_id": result.inserted_id})
 
+    @traced("db.get_reminders")
     async def get_reminders(self, birthday_id: str):
-        cursor = self.db.reminders.find({
+        cursor = self.read_db.reminders.find({
             "birthday_id": birthday_id,
             "is_active": True
         }).sort("days_before", 1)
@@ -118,6 +567,7 @@ class Database:
             reminders.append(r)
         return reminders
 
+    @traced("db.get_all_active_reminders")
     async def get_all_active_reminders(self):
         pipeline = [
             {"$match": {"is_active": True}},
@@ -147,12 +597,141 @@ class Database:
             reminders.append(r)
         return reminders
 
+    @traced("db.materialize_due_reminders")
+    async def materialize_due_reminders(self, send_date: date, reminder_filter: Optional[dict] = None) -> int:
+        """Записывает в due_reminders напоминания, которые нужно отправить в send_date.
+
+        reminder_filter ограничивает пересчёт отдельными напоминаниями.
+        """
+        send_datetime = datetime.combine(send_date, datetime.min.time())
+        pipeline = [
+            {"$match": {"is_active": True, **(reminder_filter or {})}},
+            {"$lookup": {
+                "from": "birthdays",
+                "let": {"birthday_id": {"$toObjectId": "$birthday_id"}},
+                "pipeline": [{"$match": {"$expr": {"$eq": ["$_id", "$$birthday_id"]}}}],
+                "as": "birthday"
+            }},
+            {"$unwind": "$birthday"},
+            # Напоминание срабатывает, если через days_before дней после send_date
+            # совпадают день и месяц рождения
+            {"$addFields": {
+                "fire_date": {"$add": [send_datetime, {"$multiply": ["$days_before", 86400000]}]}
+            }},
+            {"$match": {"$expr": {"$and": [
+                {"$eq": [{"$month": "$fire_date"}, {"$month": "$birthday.birth_date"}]},
+                {"$eq": [{"$dayOfMonth": "$fire_date"}, {"$dayOfMonth": "$birthday.birth_date"}]}
+            ]}}},
+            {"$project": {
+                "send_date": {"$literal": send_datetime},
+                "birthday_id": 1,
+                "days_before": 1,
+                "name": "$birthday.name",
+                "user_id": "$birthday.user_id",
+                "gift_ideas": "$birthday.gift_ideas"
+            }},
+            {"$merge": {
+                "into": "due_reminders",
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }}
+        ]
+        await self.db.reminders.aggregate(pipeline).to_list(length=None)
+        return await self.db.due_reminders.count_documents({"send_date": send_datetime})
+
+    @traced("db.get_due_reminders")
+    async def get_due_reminders(self, send_date: date):
+        """Возвращает заранее подготовленные напоминания на send_date"""
+        send_datetime = datetime.combine(send_date, datetime.min.time())
+        cursor = self.db.due_reminders.find(
+            {"send_date": send_datetime},
+            {"send_date": 0}
+        ).sort("user_id", 1)
+        reminders = []
+        async for r in cursor:
+            r["id"] = str(r["_id"])
+            del r["_id"]
+            reminders.append(r)
+        return reminders
+
+    @traced("db.get_birthday_ids")
+    async def get_birthday_ids(self, user_ids) -> List[str]:
+        cursor = self.db.birthdays.find({"user_id": {"$in": list(user_ids)}}, {"_id": 1})
+        return [str(b["_id"]) async for b in cursor]
+
+    @traced("db.deactivate_undeliverable")
+    async def deactivate_undeliverable(self, chat_ids):
+        """Отключает напоминания и подписки чатов, куда бот больше не может писать.
+
+        Напоминания владельца, у которого остались подписчики, не отключаются:
+        владелец только помечается unreachable_at и пропускается при отправке.
+        """
+        chat_ids = list(chat_ids)
+        now = datetime.utcnow()
+        await self.db.subscriptions.delete_many({"chat_id": {"$in": chat_ids}})
+        shared = set(await self.db.subscriptions.distinct("owner_id", {"owner_id": {"$in": chat_ids}}))
+        lonely = [chat_id for chat_id in chat_ids if chat_id not in shared]
+
+        birthday_ids = await self.get_birthday_ids(lonely)
+        await asyncio.gather(
+            self.db.reminders.update_many(
+                {"birthday_id": {"$in": birthday_ids}, "is_active": True},
+                {"$set": {"is_active": False, "deactivated_reason": "undeliverable"}}
+            ),
+            self.db.users.update_many(
+                {"telegram_id": {"$in": lonely}},
+                {"$set": {"undeliverable_at": now}}
+            ),
+            self.db.users.update_many(
+                {"telegram_id": {"$in": list(shared)}},
+                {"$set": {"unreachable_at": now}}
+            ),
+        )
+
+    @traced("db.migrate_chat")
+    async def migrate_chat(self, old_chat_id: int, new_chat_id: int):
+        """Переносит подписки группы на id супергруппы"""
+        owner_ids = await self.db.subscriptions.distinct("owner_id", {"chat_id": old_chat_id})
+        for owner_id in owner_ids:
+            await self.db.subscriptions.update_one(
+                {"owner_id": owner_id, "chat_id": new_chat_id},
+                {"$setOnInsert": {"created_at": datetime.utcnow()}},
+                upsert=True
+            )
+        await self.db.subscriptions.delete_many({"chat_id": old_chat_id})
+
+    @traced("db.get_unreachable_chats")
+    async def get_unreachable_chats(self, chat_ids) -> set:
+        """Владельцы списков, которым нельзя писать, но чьи подписчики ещё получают напоминания"""
+        cursor = self.db.users.find(
+            {"telegram_id": {"$in": list(chat_ids)}, "unreachable_at": {"$exists": True}},
+            {"_id": 0, "telegram_id": 1}
+        )
+        return {u["telegram_id"] async for u in cursor}
+
+    @traced("db.add_failed_delivery")
+    async def add_failed_delivery(self, reminder: dict, chat_id: int, reason: str, error: str, attempts: int):
+        """Сохраняет неудачную отправку в dead-letter коллекцию"""
+        await self.db.failed_deliveries.insert_one({
+            "reminder_id": reminder.get("id"),
+            "birthday_id": reminder.get("birthday_id"),
+            "chat_id": chat_id,
+            "reason": reason,
+            "error": error,
+            "attempts": attempts,
+            "created_at": datetime.utcnow()
+        })
+
+    @traced("db.delete_reminder")
     async def delete_reminder(self, reminder_id: str):
         await self.db.reminders.delete_one({"_id": ObjectId(reminder_id)})
+        await self.db.due_reminders.delete_one({"_id": ObjectId(reminder_id)})
 
+    @traced("db.get_birthday_by_id")
     async def get_birthday_by_id(self, birthday_id: str):
         try:
-            b = await self.db.birthdays.find_one({"_id": ObjectId(birthday_id)})
+            b = await self.read_db.birthdays.find_one({"_id": ObjectId(birthday_id)})
             if not b:
                 return None
             b["id"] = str(b["_id"])
@@ -164,6 +743,9 @@ class Database:
             return None
 
     async def close(self):
+        for task in (self.index_task, self.migration_task):
+            if task and not task.done():
+                task.cancel()
         if self.client:
             self.client.close()
 
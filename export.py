@@ -0,0 +1,40 @@
+import gzip
+import json
+import os
+import tempfile
+
+from database import db
+
+
+def _dumps(doc) -> str:
+    return json.dumps(doc, ensure_ascii=False, default=str)
+
+
+async def _write_array(f, docs):
+    first = True
+    async for doc in docs:
+        if not first:
+            f.write(",\n")
+        f.write(_dumps(doc))
+        first = False
+
+
+async def build_user_export(user_id: int) -> str:
+    """Выгружает данные пользователя в сжатый JSON-файл и возвращает путь к нему.
+
+    Документы пишутся в файл по мере чтения курсоров, поэтому память не растёт с объёмом данных.
+    """
+    fd, path = tempfile.mkstemp(prefix="export_", suffix=".json.gz")
+    os.close(fd)
+    try:
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            user = await db.get_user(user_id)
+            f.write('{"user": ' + _dumps(user) + ',\n"birthdays": [\n')
+            await _write_array(f, db.iter_export_birthdays(user_id))
+            f.write('\n],\n"subscriptions": [\n')
+            await _write_array(f, db.iter_export_subscriptions(user_id))
+            f.write('\n]}\n')
+    except Exception:
+        os.remove(path)
+        raise
+    return path
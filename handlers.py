@@ -1,13 +1,21 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import CommandStart, Command
+from aiogram.types import (
+    Message, CallbackQuery, FSInputFile, InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+)
+from aiogram.filters import CommandStart, Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from database import db
+from export import build_user_export
 from keyboards import *
-from utils import parse_date, format_birthday_info
+from utils import (
+    parse_date, format_birthday_info, format_date, format_days_left, days_until_birthday, normalize_name
+)
 import logging
+import os
+import time
+from collections import OrderedDict
 
 router = Router()
 
@@ -24,11 +32,19 @@ class BirthdayStates(StatesGroup):
 temp_birthday_data = {}
 temp_reminder_data = {}
 
+# Небольшой кэш результатов инлайн-поиска: повторные запросы при наборе не идут в базу
+INLINE_PAGE_SIZE = 20
+INLINE_CACHE_TTL = 10
+INLINE_CACHE_SIZE = 1000
+inline_cache = OrderedDict()
+
 
 @router.message(CommandStart())
 async def cmd_start(message: Message):
     """Обработчик команды /start"""
     await db.add_user(message.from_user.id, message.from_user.username)
+    await db.restore_archived_user(message.from_user.id)
+    await db.restore_deliverable(message.from_user.id)
 
     welcome_text = """
 🎂 *Добро пожаловать в Дневник Дней Рождения!*
@@ -83,7 +99,9 @@ async def process_name(message: Message, state: FSMContext):
         "• 01.01.1990\n"
         "• 01/01/1990\n"
         "• 01-01-1990\n"
-        "• 01.01 (текущий год)",
+        "• 1990-01-01\n"
+        "• 5 марта 1990\n"
+        "• 01.01 или 5 марта (текущий год)",
         parse_mode='Markdown'
     )
     await state.set_state(BirthdayStates.waiting_for_date)
@@ -122,7 +140,9 @@ async def process_date(message: Message, state: FSMContext):
             "• 01.01.1990\n"
             "• 01/01/1990\n"
             "• 01-01-1990\n"
-            "• 01.01 (текущий год)"
+            "• 1990-01-01\n"
+            "• 5 марта 1990\n"
+            "• 01.01 или 5 марта (текущий год)"
         )
 
 
@@ -173,7 +193,6 @@ async def list_birthdays(callback: CallbackQuery):
         return
 
     # Сортируем по дням до дня рождения
-    from utils import days_until_birthday
     birthdays.sort(key=lambda x: days_until_birthday(x['birth_date']))
 
     text = "📅 *Ваши дни рождения:*\n\n"
@@ -418,15 +437,26 @@ async def show_help(callback: CallbackQuery):
 • 01.01.1990
 • 01/01/1990  
 • 01-01-1990
-• 01.01 (текущий год)
+• 1990-01-01
+• 5 марта 1990
+• 01.01 или 5 марта (текущий год)
 
 *Напоминания:*
 Бот будет присылать уведомления каждый день в 9:00 утра за указанное количество дней до дня рождения.
 
 *Команды:*
 /start - Главное меню
+/upcoming N - Дни рождения в ближайшие N дней
+/share - Поделиться своим списком
+/join КОД - Получать напоминания из чужого списка
+/leave КОД - Отписаться от списка
+/export - Выгрузить все свои данные
+/delete\\_me - Удалить все свои данные
 /help - Эта справка
 
+*Поиск:*
+Наберите в любом чате имя бота и начало имени именинника
+
 Удачного использования! 🎉
     """
 
@@ -447,6 +477,148 @@ async def cancel_action(callback: CallbackQuery, state: FSMContext):
     )
 
 
+@router.message(Command("upcoming"))
+async def cmd_upcoming(message: Message, command: CommandObject):
+    """Обработчик команды /upcoming N"""
+    days = 30
+    if command.args:
+        try:
+            days = int(command.args.strip())
+        except ValueError:
+            await message.answer("❌ Укажите количество дней числом, например: /upcoming 30")
+            return
+    days = max(0, min(days, 365))
+
+    birthdays = await db.get_upcoming_birthdays(message.from_user.id, days)
+
+    if not birthdays:
+        await message.answer(
+            f"📅 В ближайшие {days} дней дней рождения нет.",
+            reply_markup=main_menu()
+        )
+        return
+
+    text = f"📅 *Дни рождения в ближайшие {days} дней:*\n\n"
+    for birthday in birthdays:
+        when = format_days_left(days_until_birthday(birthday['birth_date']))
+        text += f"• *{birthday['name']}* — {format_date(birthday['birth_date'])}, {when}\n"
+
+    await message.answer(
+        text,
+        reply_markup=main_menu(),
+        parse_mode='Markdown'
+    )
+
+
+@router.message(Command("share"))
+async def cmd_share(message: Message):
+    """Обработчик команды /share"""
+    await db.add_user(message.from_user.id, message.from_user.username)
+    share_code = await db.get_share_code(message.from_user.id)
+
+    await message.answer(
+        "🔗 *Общий список*\n\n"
+        "Отправьте эту команду родным или добавьте её в групповой чат, "
+        "чтобы они тоже получали напоминания о ваших днях рождения:\n\n"
+        f"`/join {share_code}`",
+        parse_mode='Markdown'
+    )
+
+
+@router.message(Command("join"))
+async def cmd_join(message: Message, command: CommandObject):
+    """Обработчик команды /join КОД"""
+    if not command.args:
+        await message.answer("❌ Укажите код списка, например: /join abc123")
+        return
+
+    owner = await db.subscribe(command.args.strip(), message.chat.id)
+    if not owner:
+        await message.answer("❌ Список с таким кодом не найден")
+        return
+
+    owner_name = f"@{owner['username']}" if owner.get('username') else "владельца"
+    await message.answer(f"✅ Этот чат будет получать напоминания из списка {owner_name}")
+
+
+@router.message(Command("leave"))
+async def cmd_leave(message: Message, command: CommandObject):
+    """Обработчик команды /leave КОД"""
+    if not command.args or not await db.unsubscribe(command.args.strip(), message.chat.id):
+        await message.answer("❌ Этот чат не подписан на такой список")
+        return
+
+    await message.answer("✅ Вы отписались от списка")
+
+
+@router.message(Command("export"))
+async def cmd_export(message: Message):
+    """Обработчик команды /export"""
+    path = await build_user_export(message.from_user.id)
+    try:
+        await message.answer_document(
+            FSInputFile(path, filename="birthdays_export.json.gz"),
+            caption="📦 Ваши данные: дни рождения, напоминания и идеи подарков"
+        )
+    finally:
+        os.remove(path)
+
+
+@router.message(Command("delete_me"))
+async def cmd_delete_me(message: Message):
+    """Обработчик команды /delete_me"""
+    await message.answer(
+        "❌ Удалить все ваши дни рождения, напоминания и подписки?\n\n"
+        "Это действие нельзя отменить!",
+        reply_markup=confirm_delete_account()
+    )
+
+
+@router.callback_query(F.data == "account_delete_confirm")
+async def delete_me_confirmed(callback: CallbackQuery):
+    """Подтвержденное удаление всех данных пользователя"""
+    deleted = await db.delete_user_data(callback.from_user.id)
+
+    await callback.message.edit_text(
+        f"✅ Ваши данные удалены (дней рождения: {deleted}).\n\n"
+        "Чтобы начать заново, отправьте /start"
+    )
+
+
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery):
+    """Инлайн-поиск дней рождения по началу имени"""
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    key = (inline_query.from_user.id, normalize_name(inline_query.query), offset)
+
+    cached = inline_cache.get(key)
+    if cached and time.monotonic() - cached[0] < INLINE_CACHE_TTL:
+        inline_cache.move_to_end(key)
+        birthdays = cached[1]
+    else:
+        birthdays = await db.search_birthdays(inline_query.from_user.id, inline_query.query, offset, INLINE_PAGE_SIZE)
+        inline_cache[key] = (time.monotonic(), birthdays)
+        inline_cache.move_to_end(key)
+        while len(inline_cache) > INLINE_CACHE_SIZE:
+            inline_cache.popitem(last=False)
+
+    results = []
+    for birthday in birthdays:
+        when = format_days_left(days_until_birthday(birthday['birth_date']))
+        results.append(InlineQueryResultArticle(
+            id=birthday['id'],
+            title=birthday['name'],
+            description=f"{format_date(birthday['birth_date'])} — {when}",
+            input_message_content=InputTextMessageContent(
+                message_text=format_birthday_info(birthday),
+                parse_mode='Markdown'
+            )
+        ))
+
+    next_offset = str(offset + INLINE_PAGE_SIZE) if len(birthdays) == INLINE_PAGE_SIZE else ""
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TTL, is_personal=True, next_offset=next_offset)
+
+
 @router.message(Command("help"))
 async def cmd_help(message: Message):
     """Обработчик команды /help"""
@@ -463,15 +635,26 @@ async def cmd_help(message: Message):
 • 01.01.1990
 • 01/01/1990  
 • 01-01-1990
-• 01.01 (текущий год)
+• 1990-01-01
+• 5 марта 1990
+• 01.01 или 5 марта (текущий год)
 
 *Напоминания:*
 Бот будет присылать уведомления каждый день в 9:00 утра за указанное количество дней до дня рождения.
 
 *Команды:*
 /start - Главное меню
+/upcoming N - Дни рождения в ближайшие N дней
+/share - Поделиться своим списком
+/join КОД - Получать напоминания из чужого списка
+/leave КОД - Отписаться от списка
+/export - Выгрузить все свои данные
+/delete\\_me - Удалить все свои данные
 /help - Эта справка
 
+*Поиск:*
+Наберите в любом чате имя бота и начало имени именинника
+
 Удачного использования! 🎉
     """
 
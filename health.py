@@ -0,0 +1,103 @@
+import asyncio
+import time
+from aiogram.types import Update
+
+from config import HEALTH_PROBE_INTERVAL, REMINDERS_STALE_SECONDS
+
+
+class HealthMonitor:
+    """Хранит в памяти результаты фоновых проверок, чтобы /ready и /live не нагружали базу"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.mongo_ok = False
+        self.mongo_latency = None
+        self.last_probe_at = None
+        self.last_reminders_check_at = None
+        self.last_update_at = None
+        self.update_lag = None
+        self.task = None
+
+    def start(self, db):
+        """Запускает фоновую проверку базы"""
+        self.task = asyncio.create_task(self.probe_loop(db))
+
+    def stop(self):
+        """Останавливает фоновую проверку"""
+        if self.task:
+            self.task.cancel()
+
+    async def probe_loop(self, db):
+        while True:
+            await self.probe(db)
+            await asyncio.sleep(HEALTH_PROBE_INTERVAL)
+
+    async def probe(self, db):
+        """Замеряет время ответа MongoDB"""
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(db.ping(), timeout=HEALTH_PROBE_INTERVAL)
+            self.mongo_ok = True
+            self.mongo_latency = time.monotonic() - started
+        except Exception:
+            self.mongo_ok = False
+            self.mongo_latency = None
+        self.last_probe_at = time.monotonic()
+
+    def record_reminders_check(self):
+        self.last_reminders_check_at = time.monotonic()
+
+    def record_update(self, sent_at):
+        """Запоминает задержку обработки апдейта (от отправки сообщения до конца обработки)"""
+        self.last_update_at = time.monotonic()
+        if sent_at is not None:
+            self.update_lag = max(time.time() - sent_at, 0.0)
+
+    def liveness(self) -> dict:
+        """Жив ли цикл событий бота: фоновая проверка должна выполняться регулярно"""
+        now = time.monotonic()
+        probe_age = now - self.last_probe_at if self.last_probe_at is not None else None
+        alive = probe_age is not None and probe_age < HEALTH_PROBE_INTERVAL * 3
+        return {
+            "status": "ok" if alive else "fail",
+            "probe_age_seconds": _round(probe_age),
+        }
+
+    def readiness(self) -> dict:
+        """Готов ли инстанс принимать трафик"""
+        now = time.monotonic()
+        report = self.liveness()
+        reminders_reference = self.last_reminders_check_at or self.started_at
+        reminders_age = now - reminders_reference
+        ready = (
+            report["status"] == "ok"
+            and self.mongo_ok
+            and reminders_age < REMINDERS_STALE_SECONDS
+        )
+        report.update({
+            "status": "ok" if ready else "fail",
+            "mongo_ok": self.mongo_ok,
+            "mongo_latency_ms": _round(self.mongo_latency * 1000 if self.mongo_latency is not None else None),
+            "seconds_since_reminders_check": _round(
+                now - self.last_reminders_check_at if self.last_reminders_check_at is not None else None
+            ),
+            "seconds_since_update": _round(now - self.last_update_at if self.last_update_at is not None else None),
+            "update_lag_seconds": _round(self.update_lag),
+        })
+        return report
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+async def track_updates(handler, event: Update, data):
+    """Middleware, которое замеряет задержку обработки апдейтов"""
+    sent_at = event.message.date.timestamp() if event.message else None
+    try:
+        return await handler(event, data)
+    finally:
+        monitor.record_update(sent_at)
+
+
+monitor = HealthMonitor()
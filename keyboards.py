@@ -50,6 +50,13 @@ def confirm_delete(birthday_id):
     ])
     return keyboard
 
+def confirm_delete_account():
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Да, удалить всё", callback_data="account_delete_confirm")],
+        [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel")]
+    ])
+    return keyboard
+
 def back_to_main():
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="⬅️ Главное меню", callback_data="main_menu")]
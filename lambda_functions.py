@@ -19,7 +19,8 @@ def lambda_handler(event, context):
 
     async def process():
         update = types.Update.model_validate_json(body)
-        await db.init()
+        # Индексы создаются обычным запуском бота, здесь их проверка только замедляет каждый вызов
+        await db.init(index_mode="skip")
         await dp.feed_update(bot, update)
         return {"statusCode": 200, "body": "ok"}
 
@@ -0,0 +1,45 @@
+import logging
+from datetime import date, datetime, timedelta
+
+from config import ARCHIVE_UNDELIVERABLE_AFTER_DAYS, ARCHIVE_INACTIVE_AFTER_DAYS
+from database import db
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityTracker:
+    """Middleware, которое обновляет last_seen_at не чаще раза в день на пользователя"""
+
+    def __init__(self):
+        self.day = None
+        self.seen = set()
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user:
+            today = date.today()
+            if today != self.day:
+                self.day = today
+                self.seen = set()
+            if user.id not in self.seen:
+                self.seen.add(user.id)
+                try:
+                    await db.touch_user(user.id)
+                except Exception as e:
+                    logger.warning(f"Не удалось обновить активность пользователя {user.id}: {e}")
+        return await handler(event, data)
+
+
+track_activity = ActivityTracker()
+
+
+async def archive_inactive():
+    """Переносит данные давно недоступных и неактивных пользователей в архив"""
+    now = datetime.utcnow()
+    undeliverable_before = now - timedelta(days=ARCHIVE_UNDELIVERABLE_AFTER_DAYS) if ARCHIVE_UNDELIVERABLE_AFTER_DAYS else None
+    inactive_before = now - timedelta(days=ARCHIVE_INACTIVE_AFTER_DAYS) if ARCHIVE_INACTIVE_AFTER_DAYS else None
+    try:
+        archived = await db.archive_inactive_users(undeliverable_before, inactive_before)
+        logger.info(f"Перенесено в архив пользователей: {archived}")
+    except Exception as e:
+        logger.error(f"Ошибка при архивировании неактивных пользователей: {e}")
@@ -1,67 +1,130 @@
 import asyncio
+import atexit
 import logging
+import queue
 import threading
 import os
+import time
+from logging.handlers import QueueHandler, QueueListener
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
-from fastapi import FastAPI
-import uvicorn
 
 from config import BOT_TOKEN
 from database import db
 from handlers import router
+from health import monitor, track_updates
+from lifecycle import track_activity
 from scheduler import ReminderScheduler
+from tracing import trace_updates, trace_bot_requests
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Настройка логирования: записи попадают в очередь, а в поток вывода их пишет отдельный поток,
+# чтобы логирование не блокировало цикл событий
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_listener = QueueListener(log_queue, log_handler)
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(log_queue)])
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
-# FastAPI приложение для health check
-app = FastAPI()
+_app = None
 
-@app.get('/')
-async def health_check():
-    return {'status': 'ok'}
+
+def create_app():
+    """FastAPI приложение для health check (FastAPI импортируется только при необходимости)"""
+    global _app
+    if _app is None:
+        from fastapi import FastAPI
+        from fastapi.responses import JSONResponse
+
+        _app = FastAPI()
+
+        @_app.get('/')
+        async def health_check():
+            return {'status': 'ok'}
+
+        # Значения берутся из памяти — частые проверки балансировщика не нагружают базу
+        @_app.get('/live')
+        async def liveness_check():
+            report = monitor.liveness()
+            return JSONResponse(report, status_code=200 if report['status'] == 'ok' else 503)
+
+        @_app.get('/ready')
+        async def readiness_check():
+            report = monitor.readiness()
+            return JSONResponse(report, status_code=200 if report['status'] == 'ok' else 503)
+
+    return _app
+
+
+def __getattr__(name):
+    # Позволяет по-прежнему запускать `uvicorn main:app`
+    if name == 'app':
+        return create_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def run_web():
+    import uvicorn
+
     port = int(os.environ.get('PORT', 8000))
-    uvicorn.run('main:app', host='0.0.0.0', port=port, log_level='info')
+    uvicorn.run(create_app(), host='0.0.0.0', port=port, log_level='info')
+
+
+async def timed(name: str, timings: dict, coro):
+    """Выполняет шаг запуска и запоминает его длительность"""
+    started = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[name] = time.perf_counter() - started
 
 async def start_bot():
     """Запуск логики Telegram-бота"""
     # Инициализация бота и диспетчера
     bot = Bot(token=BOT_TOKEN)
+    bot.session.middleware(trace_bot_requests)
     storage = MemoryStorage()
     dp = Dispatcher(storage=storage)
 
     # Регистрация роутера
     dp.include_router(router)
+    dp.update.outer_middleware(trace_updates)
+    dp.update.outer_middleware(track_updates)
+    dp.update.outer_middleware(track_activity)
 
     try:
-        # Инициализация базы данных
-        logger.info("Инициализация базы данных...")
-        await db.init()
+        timings = {}
+        started = time.perf_counter()
+
+        # База данных и сброс вебхука не зависят друг от друга, поэтому выполняем их параллельно
+        logger.info("Инициализация базы данных и сброс вебхука...")
+        await asyncio.gather(
+            timed("база данных", timings, db.init()),
+            timed("вебхук", timings, bot.delete_webhook(drop_pending_updates=True)),
+        )
         logger.info("База данных инициализирована")
+        monitor.start(db)
 
         # Инициализация и запуск планировщика напоминаний
         logger.info("Запуск планировщика напоминаний...")
         scheduler = ReminderScheduler(bot)
-        await scheduler.start()
+        await timed("планировщик", timings, scheduler.start())
         logger.info("Планировщик запущен")
 
+        timings["всего"] = time.perf_counter() - started
+        logger.info("Время запуска: " + ", ".join(f"{name} {seconds:.2f} с" for name, seconds in timings.items()))
+
         # Запуск бота
         logger.info("Запуск бота...")
-        await bot.delete_webhook(drop_pending_updates=True)
         await dp.start_polling(bot)
 
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
     finally:
         # Закрытие соединений
+        monitor.stop()
         await bot.session.close()
         await db.close()
         if 'scheduler' in locals() and hasattr(scheduler, 'stop'):
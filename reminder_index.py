@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import sys
+from datetime import date, timedelta
+from bson import ObjectId
+
+from config import REMINDER_INDEX_RESYNC_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+def day_index(d) -> int:
+    """Номер дня в високосном году (0..365), чтобы 29 февраля имело свою корзину"""
+    return date(2000, d.month, d.day).timetuple().tm_yday - 1
+
+
+class BirthdayEntry:
+    __slots__ = ("user_id", "name", "gift_ideas", "day", "reminder_ids")
+
+    def __init__(self, user_id, name, gift_ideas, day):
+        self.user_id = user_id
+        self.name = name
+        self.gift_ideas = gift_ideas
+        self.day = day
+        self.reminder_ids = set()
+
+
+class ReminderEntry:
+    __slots__ = ("birthday_id", "days_before")
+
+    def __init__(self, birthday_id, days_before):
+        self.birthday_id = birthday_id
+        self.days_before = days_before
+
+
+class ReminderIndex:
+    """Напоминания в памяти, разложенные по 366 корзинам дня рождения.
+
+    Корзина хранит {days_before: set(reminder_id)}, поэтому поиск напоминаний на дату
+    стоит O(число сработавших напоминаний + число разных days_before) и не обращается к базе.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.birthdays = {}
+        self.reminders = {}
+        self.buckets = [{} for _ in range(366)]
+        self.days_before_counts = {}
+        self.task = None
+
+    async def start(self):
+        """Загружает индекс и запускает синхронизацию"""
+        await self.load()
+        self.task = asyncio.create_task(self.sync_loop())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def load(self):
+        """Полная загрузка активных напоминаний из базы"""
+        reminders = await self.db.get_all_active_reminders()
+        self.birthdays = {}
+        self.reminders = {}
+        self.buckets = [{} for _ in range(366)]
+        self.days_before_counts = {}
+        for r in reminders:
+            self.put_birthday(r["birthday_id"], r["user_id"], r["name"], r.get("gift_ideas"), r["birth_date"])
+            self.put_reminder(r["id"], r["birthday_id"], r["days_before"])
+
+        size = self.memory_usage()
+        per_reminder = size // len(self.reminders) if self.reminders else 0
+        logger.info(f"Индекс напоминаний: {len(self.reminders)} напоминаний, "
+                    f"~{size // 1024} КБ ({per_reminder} байт на напоминание)")
+
+    async def sync_loop(self):
+        """Следит за изменениями через change streams, а при ошибке периодически перезагружает индекс"""
+        while True:
+            try:
+                await self.watch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Change stream недоступен, индекс будет перезагружаться: {e}")
+            await asyncio.sleep(REMINDER_INDEX_RESYNC_INTERVAL)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Ошибка при перезагрузке индекса напоминаний: {e}")
+
+    async def watch(self):
+        pipeline = [{"$match": {"ns.coll": {"$in": ["birthdays", "reminders"]}}}]
+        async with self.db.db.watch(pipeline, full_document="updateLookup") as stream:
+            # Поток открыт до загрузки, поэтому изменения во время загрузки не потеряются
+            await self.load()
+            async for change in stream:
+                await self.apply(change)
+
+    async def apply(self, change: dict):
+        """Применяет одно событие change stream"""
+        collection = change["ns"]["coll"]
+        doc_id = str(change["documentKey"]["_id"])
+        doc = change.get("fullDocument")
+
+        if collection == "birthdays":
+            if change["operationType"] == "delete" or not doc:
+                self.remove_birthday(doc_id)
+            elif change["operationType"] == "insert" or doc_id in self.birthdays:
+                self.put_birthday(doc_id, doc["user_id"], doc["name"], doc.get("gift_ideas"), doc["birth_date"])
+        else:
+            if change["operationType"] == "delete" or not doc or not doc.get("is_active"):
+                self.remove_reminder(doc_id)
+            else:
+                if doc["birthday_id"] not in self.birthdays:
+                    # Читаем с primary: на отстающей secondary нового дня рождения может ещё не быть
+                    birthday = await self.db.db.birthdays.find_one({"_id": ObjectId(doc["birthday_id"])})
+                    if not birthday:
+                        return
+                    self.put_birthday(doc["birthday_id"], birthday["user_id"], birthday["name"],
+                                      birthday.get("gift_ideas"), birthday["birth_date"])
+                self.put_reminder(doc_id, doc["birthday_id"], doc["days_before"])
+
+    def put_birthday(self, birthday_id, user_id, name, gift_ideas, birth_date):
+        day = day_index(birth_date)
+        entry = self.birthdays.get(birthday_id)
+        if entry is None:
+            self.birthdays[birthday_id] = BirthdayEntry(user_id, name, gift_ideas, day)
+            return
+
+        entry.user_id = user_id
+        entry.name = name
+        entry.gift_ideas = gift_ideas
+        if entry.day != day:
+            # Дата изменилась — переносим напоминания в новую корзину
+            moved = [(reminder_id, self.reminders[reminder_id].days_before) for reminder_id in entry.reminder_ids]
+            for reminder_id, _ in moved:
+                self.remove_reminder(reminder_id)
+            entry.day = day
+            for reminder_id, days_before in moved:
+                self.put_reminder(reminder_id, birthday_id, days_before)
+
+    def put_reminder(self, reminder_id, birthday_id, days_before):
+        self.remove_reminder(reminder_id)
+        birthday = self.birthdays[birthday_id]
+        self.reminders[reminder_id] = ReminderEntry(birthday_id, days_before)
+        birthday.reminder_ids.add(reminder_id)
+        self.buckets[birthday.day].setdefault(days_before, set()).add(reminder_id)
+        self.days_before_counts[days_before] = self.days_before_counts.get(days_before, 0) + 1
+
+    def remove_reminder(self, reminder_id):
+        reminder = self.reminders.pop(reminder_id, None)
+        if reminder is None:
+            return
+        self.days_before_counts[reminder.days_before] -= 1
+        if not self.days_before_counts[reminder.days_before]:
+            del self.days_before_counts[reminder.days_before]
+        birthday = self.birthdays.get(reminder.birthday_id)
+        if birthday is None:
+            return
+        birthday.reminder_ids.discard(reminder_id)
+        bucket = self.buckets[birthday.day]
+        ids = bucket.get(reminder.days_before)
+        if ids is not None:
+            ids.discard(reminder_id)
+            if not ids:
+                del bucket[reminder.days_before]
+
+    def remove_birthday(self, birthday_id):
+        birthday = self.birthdays.get(birthday_id)
+        if birthday is None:
+            return
+        for reminder_id in list(birthday.reminder_ids):
+            self.remove_reminder(reminder_id)
+        del self.birthdays[birthday_id]
+
+    def due(self, send_date: date) -> list:
+        """Напоминания, которые нужно отправить в send_date, в формате get_due_reminders"""
+        result = []
+        for days_before in self.days_before_counts:
+            birthday_day = send_date + timedelta(days=days_before)
+            for reminder_id in self.buckets[day_index(birthday_day)].get(days_before, ()):
+                reminder = self.reminders[reminder_id]
+                birthday = self.birthdays[reminder.birthday_id]
+                result.append({
+                    "id": reminder_id,
+                    "birthday_id": reminder.birthday_id,
+                    "days_before": days_before,
+                    "name": birthday.name,
+                    "user_id": birthday.user_id,
+                    "gift_ideas": birthday.gift_ideas,
+                })
+        return result
+
+    def memory_usage(self) -> int:
+        """Примерный объём памяти индекса в байтах"""
+        size = sys.getsizeof(self.birthdays) + sys.getsizeof(self.reminders) + sys.getsizeof(self.buckets)
+        for birthday_id, entry in self.birthdays.items():
+            size += sys.getsizeof(birthday_id) + sys.getsizeof(entry) + sys.getsizeof(entry.reminder_ids)
+            size += sys.getsizeof(entry.name) + sys.getsizeof(entry.gift_ideas)
+        for reminder_id, entry in self.reminders.items():
+            size += sys.getsizeof(reminder_id) + sys.getsizeof(entry)
+        for bucket in self.buckets:
+            size += sys.getsizeof(bucket) + sum(sys.getsizeof(ids) for ids in bucket.values())
+        return size
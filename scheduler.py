@@ -1,67 +1,173 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramMigrateToChat, TelegramNetworkError, TelegramRetryAfter,
+    TelegramServerError
+)
 from datetime import datetime, date
+from config import REMINDER_INDEX_ENABLED, SEND_MAX_ATTEMPTS, SEND_RETRY_BASE_DELAY
 from database import db
-from utils import days_until_birthday, format_birthday_info
+from health import monitor
+from lifecycle import archive_inactive
+from reminder_index import ReminderIndex
+from tracing import root_span
 import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class ReminderScheduler:
     def __init__(self, bot):
         self.bot = bot
         self.scheduler = AsyncIOScheduler()
+        self.materialized_for = None
+        self.reminder_index = ReminderIndex(db) if REMINDER_INDEX_ENABLED else None
 
     async def start(self):
         """Запускает планировщик"""
+        if self.reminder_index:
+            await self.reminder_index.start()
+        else:
+            self.scheduler.add_job(
+                self.materialize_due_reminders,
+                'cron',
+                hour=0,  # Готовим список напоминаний на день сразу после полуночи
+                minute=5
+            )
         self.scheduler.add_job(
             self.check_reminders,
             'cron',
             hour=9,  # Проверяем каждый день в 9 утра
             minute=0
         )
+        self.scheduler.add_job(
+            archive_inactive,
+            'cron',
+            hour=3,  # Архивируем ночью, когда нагрузка минимальна
+            minute=30
+        )
         self.scheduler.start()
 
+    async def materialize_due_reminders(self):
+        """Заранее собирает напоминания, которые нужно отправить сегодня"""
+        try:
+            today = date.today()
+            count = await db.materialize_due_reminders(today)
+            self.materialized_for = today
+            logger.info(f"Подготовлено напоминаний на {today}: {count}")
+        except Exception as e:
+            logger.error(f"Ошибка при подготовке напоминаний: {e}")
+
     async def check_reminders(self):
         """Проверяет напоминания и отправляет уведомления"""
-        try:
-            reminders = await db.get_all_active_reminders()
+        with root_span("scheduler.check_reminders"):
+            try:
+                today = date.today()
 
-            for reminder in reminders:
-                birth_date = reminder['birth_date']
-                days_left = days_until_birthday(birth_date)
+                if self.reminder_index:
+                    reminders = self.reminder_index.due(today)
+                else:
+                    # Если ночная подготовка не выполнялась (например, бот был перезапущен), делаем её сейчас
+                    if self.materialized_for != today:
+                        await self.materialize_due_reminders()
+                    reminders = await db.get_due_reminders(today)
 
-                # Если количество дней до дня рождения совпадает с напоминанием
-                if days_left == reminder['days_before']:
-                    await self.send_reminder(reminder)
+                owner_ids = {r['user_id'] for r in reminders}
+                subscribers = await db.get_subscribers(owner_ids)
+                unreachable = await db.get_unreachable_chats(owner_ids)
 
-        except Exception as e:
-            print(f"Ошибка при проверке напоминаний: {e}")
+                # Недоступный владелец пропускается; когда подписчиков не осталось, его напоминания отключаются
+                undeliverable = {owner_id for owner_id in unreachable if not subscribers.get(owner_id)}
 
-    async def send_reminder(self, reminder):
-        """Отправляет напоминание пользователю"""
-        try:
-            user_id = reminder['user_id']
-            name = reminder['name']
-            days_before = reminder['days_before']
-            gift_ideas = reminder['gift_ideas']
-
-            if days_before == 0:
-                message = f"🎉 *СЕГОДНЯ ДЕНЬ РОЖДЕНИЯ!*\n\n"
-                message += f"У {name} сегодня день рождения! 🎂"
-            elif days_before == 1:
-                message = f"🔥 *Завтра день рождения!*\n\n"
-                message += f"У {name} завтра день рождения! 🎂"
-            else:
-                message = f"🔔 *Напоминание о дне рождения*\n\n"
-                message += f"У {name} день рождения через {days_before} дней! 🎂"
-
-            if gift_ideas:
-                message += f"\n\n🎁 Идеи подарков: {gift_ideas}"
-
-            await self.bot.send_message(user_id, message, parse_mode='Markdown')
+                # Каждое напоминание уходит владельцу списка и всем его подписчикам
+                for reminder in reminders:
+                    for chat_id in [reminder['user_id'], *subscribers.get(reminder['user_id'], [])]:
+                        if chat_id in undeliverable or chat_id in unreachable:
+                            continue
+                        if not await self.send_reminder(reminder, chat_id):
+                            undeliverable.add(chat_id)
 
+                # Заблокировавшие бота и удалённые чаты больше не попадут в проверки
+                if undeliverable:
+                    await db.deactivate_undeliverable(undeliverable)
+                    logger.info(f"Отключены напоминания для недоступных чатов: {len(undeliverable)}")
+
+                monitor.record_reminders_check()
+
+            except Exception as e:
+                logger.error(f"Ошибка при проверке напоминаний: {e}")
+
+    async def send_reminder(self, reminder, chat_id) -> bool:
+        """Отправляет напоминание в чат. Возвращает False, если чат навсегда недоступен"""
+        name = reminder['name']
+        days_before = reminder['days_before']
+        gift_ideas = reminder['gift_ideas']
+
+        if days_before == 0:
+            message = f"🎉 *СЕГОДНЯ ДЕНЬ РОЖДЕНИЯ!*\n\n"
+            message += f"У {name} сегодня день рождения! 🎂"
+        elif days_before == 1:
+            message = f"🔥 *Завтра день рождения!*\n\n"
+            message += f"У {name} завтра день рождения! 🎂"
+        else:
+            message = f"🔔 *Напоминание о дне рождения*\n\n"
+            message += f"У {name} день рождения через {days_before} дней! 🎂"
+
+        if gift_ideas:
+            message += f"\n\n🎁 Идеи подарков: {gift_ideas}"
+
+        reason, error = None, None
+        migrated = False
+        for attempt in range(1, SEND_MAX_ATTEMPTS + 1):
+            try:
+                await self.bot.send_message(chat_id, message, parse_mode='Markdown')
+                return True
+            except TelegramMigrateToChat as e:
+                # Группа стала супергруппой — переносим подписки на новый id и пробуем ещё раз
+                if migrated:
+                    await self.dead_letter(reminder, chat_id, "migrated", e, attempt)
+                    return False
+                migrated = True
+                reason, error = "migrated", e
+                await db.migrate_chat(chat_id, e.migrate_to_chat_id)
+                chat_id = e.migrate_to_chat_id
+            except TelegramRetryAfter as e:
+                # Telegram сам говорит, сколько подождать
+                reason, error = "retry_after", e
+                if attempt < SEND_MAX_ATTEMPTS:
+                    await asyncio.sleep(e.retry_after)
+            except TelegramForbiddenError as e:
+                # Бот заблокирован, удалён из группы или аккаунт удалён
+                await self.dead_letter(reminder, chat_id, "forbidden", e, attempt)
+                return False
+            except TelegramBadRequest as e:
+                if "chat not found" in str(e).lower():
+                    await self.dead_letter(reminder, chat_id, "chat_not_found", e, attempt)
+                    return False
+                # Ошибка в самом сообщении — повтор не поможет, но чат доступен
+                await self.dead_letter(reminder, chat_id, "bad_request", e, attempt)
+                return True
+            except (TelegramNetworkError, TelegramServerError) as e:
+                reason, error = "transient", e
+                if attempt < SEND_MAX_ATTEMPTS:
+                    await asyncio.sleep(SEND_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+            except Exception as e:
+                await self.dead_letter(reminder, chat_id, "unknown", e, attempt)
+                return True
+
+        await self.dead_letter(reminder, chat_id, reason, error, SEND_MAX_ATTEMPTS)
+        return True
+
+    async def dead_letter(self, reminder, chat_id, reason, error, attempts):
+        """Записывает неудачную отправку для последующего разбора"""
+        logger.warning(f"Не удалось отправить напоминание в чат {chat_id} ({reason}): {error}")
+        try:
+            await db.add_failed_delivery(reminder, chat_id, reason, str(error), attempts)
         except Exception as e:
-            print(f"Ошибка при отправке напоминания: {e}")
+            logger.error(f"Ошибка при сохранении неудачной отправки: {e}")
 
     def stop(self):
         """Останавливает планировщик"""
+        if self.reminder_index:
+            self.reminder_index.stop()
         self.scheduler.shutdown()
\ No newline at end of file
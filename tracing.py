@@ -0,0 +1,133 @@
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from config import TRACE_SAMPLE_RATE, TRACE_FILE
+
+current_span = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attrs", "start", "error")
+
+    def __init__(self, trace_id, parent_id, name, attrs):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.error = None
+
+    def to_dict(self, duration: float) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(duration * 1000, 3),
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+class JsonLinesExporter:
+    """Пишет спаны в файл JSON Lines из отдельного потока, не блокируя цикл событий"""
+
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 500):
+        self.path = path
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.thread = None
+
+    def export(self, span: dict):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="trace-exporter", daemon=True)
+            self.thread.start()
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            # Лучше потерять спан, чем задержать обработку апдейта
+            self.dropped += 1
+
+    def run(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                batch = [self.queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                f.write("".join(json.dumps(s, ensure_ascii=False, default=str) + "\n" for s in batch))
+                f.flush()
+
+
+exporter = JsonLinesExporter(TRACE_FILE)
+
+
+@contextmanager
+def _open_span(trace_id, parent_id, name, attrs):
+    span = Span(trace_id, parent_id, name, attrs)
+    token = current_span.set(span)
+    started = time.perf_counter()
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current_span.reset(token)
+        exporter.export(span.to_dict(time.perf_counter() - started))
+
+
+@contextmanager
+def root_span(name: str, **attrs):
+    """Начинает новую трассировку с вероятностью TRACE_SAMPLE_RATE"""
+    if TRACE_SAMPLE_RATE <= 0 or random.random() >= TRACE_SAMPLE_RATE:
+        yield None
+        return
+    with _open_span(os.urandom(16).hex(), None, name, attrs) as span:
+        yield span
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Дочерний спан; вне трассировки ничего не делает"""
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    with _open_span(parent.trace_id, parent.span_id, name, attrs) as child:
+        yield child
+
+
+def traced(name: str):
+    """Декоратор для корутин: оборачивает вызов в дочерний спан"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def trace_updates(handler, event, data):
+    """Middleware диспетчера: корневой спан на каждый апдейт"""
+    with root_span("update", update_id=event.update_id):
+        return await handler(event, data)
+
+
+async def trace_bot_requests(make_request, bot, method):
+    """Middleware сессии бота: спан на каждый вызов Bot API"""
+    with span(f"bot.{type(method).__name__}"):
+        return await make_request(bot, method)
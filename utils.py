@@ -1,42 +1,99 @@
 from datetime import datetime, date
+from typing import Dict, Iterable, List, Optional, Tuple
 import re
 
 
-def parse_date(date_str: str) -> datetime:
-    """Парсит дату в различных форматах"""
-    date_str = date_str.strip()
-
-    # Попробуем различные форматы
-    formats = [
-        "%d.%m.%Y",  # 01.01.1990
-        "%d/%m/%Y",  # 01/01/1990
-        "%d-%m-%Y",  # 01-01-1990
-        "%d.%m",  # 01.01 (текущий год)
-        "%d/%m",  # 01/01 (текущий год)
-        "%d-%m",  # 01-01 (текущий год)
-    ]
-
-    for fmt in formats:
+MONTHS_GENITIVE = [
+    "января", "февраля", "марта", "апреля", "мая", "июня",
+    "июля", "августа", "сентября", "октября", "ноября", "декабря"
+]
+
+MONTHS_NOMINATIVE = [
+    "январь", "февраль", "март", "апрель", "май", "июнь",
+    "июль", "август", "сентябрь", "октябрь", "ноябрь", "декабрь"
+]
+
+# Названия месяцев по умолчанию: «5 марта», «5 март 1990»
+DEFAULT_MONTH_NAMES = {
+    **{name: i + 1 for i, name in enumerate(MONTHS_NOMINATIVE)},
+    **{name: i + 1 for i, name in enumerate(MONTHS_GENITIVE)},
+}
+
+
+class DateParser:
+    """Разбирает дату за один проход скомпилированного регулярного выражения.
+
+    Поддерживаются 01.01.1990, 01/01/1990, 01-01-1990, те же формы без года,
+    ISO 1990-01-01 и «5 марта [1990]» с настраиваемыми названиями месяцев.
+    """
+
+    def __init__(self, month_names: Optional[Dict[str, int]] = None):
+        self.month_names = {k.lower(): v for k, v in (month_names or DEFAULT_MONTH_NAMES).items()}
+        self.pattern = re.compile(
+            r"(?P<iso_year>\d{4})-(?P<iso_month>\d{1,2})-(?P<iso_day>\d{1,2})"
+            r"|(?P<day>\d{1,2})(?P<sep>[./-])(?P<month>\d{1,2})(?:(?P=sep)(?P<year>\d{4}))?"
+            r"|(?P<word_day>\d{1,2})\s+(?P<month_name>[^\W\d_]+)(?:\s+(?P<word_year>\d{4}))?"
+        )
+
+    def parse(self, date_str: str, default_year: Optional[int] = None) -> datetime:
+        """Парсит одну дату; год по умолчанию — текущий"""
+        match = self.pattern.fullmatch(date_str.strip())
+        if not match:
+            raise ValueError("Неверный формат даты")
+
+        groups = match.groupdict()
+        if groups["iso_year"]:
+            year, month, day = groups["iso_year"], groups["iso_month"], groups["iso_day"]
+        elif groups["day"]:
+            year, month, day = groups["year"], groups["month"], groups["day"]
+        else:
+            month = self.month_names.get(groups["month_name"].lower())
+            if month is None:
+                raise ValueError("Неверный формат даты")
+            year, day = groups["word_year"], groups["word_day"]
+
+        if year is None:
+            year = default_year or date.today().year
+
         try:
-            parsed_date = datetime.strptime(date_str, fmt)
-            # Если год не указан, используем текущий
-            if fmt in ["%d.%m", "%d/%m", "%d-%m"]:
-                parsed_date = parsed_date.replace(year=datetime.now().year)
-            return parsed_date
+            return datetime(int(year), int(month), int(day))
         except ValueError:
-            continue
+            raise ValueError("Неверный формат даты")
+
+    def parse_many(self, date_strs: Iterable[str]) -> Tuple[List[Optional[datetime]], List[Tuple[int, str]]]:
+        """Пакетный разбор для импорта: даты (None для ошибочных строк) и список (номер строки, ошибка)"""
+        default_year = date.today().year
+        dates, errors = [], []
+        for i, date_str in enumerate(date_strs):
+            try:
+                dates.append(self.parse(date_str, default_year))
+            except ValueError as e:
+                dates.append(None)
+                errors.append((i, str(e)))
+        return dates, errors
+
 
-    raise ValueError("Неверный формат даты")
+date_parser = DateParser()
+
+
+def parse_date(date_str: str) -> datetime:
+    """Парсит дату в различных форматах"""
+    return date_parser.parse(date_str)
+
+
+def parse_dates(date_strs: Iterable[str]) -> Tuple[List[Optional[datetime]], List[Tuple[int, str]]]:
+    """Парсит список дат, не прерываясь на ошибочных строках"""
+    return date_parser.parse_many(date_strs)
+
+
+def normalize_name(name: str) -> str:
+    """Нормализует имя для поиска: нижний регистр, ё -> е, одиночные пробелы"""
+    return " ".join(name.split()).casefold().replace("ё", "е")
 
 
 def format_date(birth_date: date) -> str:
     """Форматирует дату для отображения"""
-    months = [
-        "января", "февраля", "марта", "апреля", "мая", "июня",
-        "июля", "августа", "сентября", "октября", "ноября", "декабря"
-    ]
-
-    return f"{birth_date.day} {months[birth_date.month - 1]} {birth_date.year}"
+    return f"{birth_date.day} {MONTHS_GENITIVE[birth_date.month - 1]} {birth_date.year}"
 
 
 def calculate_age(birth_date: date) -> int:
@@ -61,6 +118,15 @@ def days_until_birthday(birth_date: date) -> int:
     return (this_year_birthday - today).days
 
 
+def format_days_left(days_left: int) -> str:
+    """Короткая подпись, когда будет день рождения"""
+    if days_left == 0:
+        return "сегодня 🎉"
+    if days_left == 1:
+        return "завтра"
+    return f"через {days_left} дней"
+
+
 def format_birthday_info(birthday: dict) -> str:
     """Форматирует информацию о дне рождения"""
     birth_date = birthday['birth_date']